@@ -1,7 +1,11 @@
 import random
 import shutil
+import sys
 import itertools
 import colorsys
+import math
+
+from PIL import Image
 
 __all__ = [
     "STANDARD_MODES",
@@ -40,37 +44,55 @@ SPECIAL_MODES = (
 )
 ALL_MODES = STANDARD_MODES + SPECIAL_MODES
 
+# Values that putdata() stores exactly like putpixel() does for these integer modes
+_PUTDATA_RANGES = {
+    "I": (-(2 ** 31), 2 ** 31 - 1),
+    "I;16": (0, 0xFFFF),
+    "I;16L": (0, 0xFFFF),
+    "I;16B": (0, 0xFFFF),
+    "I;16N": (0, 0xFFFF),
+}
+
 
 def hex_to_rgb(rgb):
     """Convert a 6-digit hexadecimal RGB number to an RGB tuple.
 
     Note: This function converts an int into a tuple of ints. To parse strings, check `pilutils.parse`."""
-    if not 0 <= rgb <= 0xFFFFFF:
+    if rgb < 0 or rgb > 0xFFFFFF:
         raise ValueError(f"{rgb!r} is not an RGB number.")
-    return (rgb >> 16, (rgb >> 8) % 256, rgb % 256)
+    return (rgb >> 16, rgb >> 8 & 0xFF, rgb & 0xFF)
 
 
 def hex_to_rgba(rgba):
     """Convert an 8-digit hexadecimal RGBA number to an RGBA tuple."""
-    if not 0 <= rgba <= 0xFFFFFFFF:
-        raise ValueError("{rgba!r} is not an RGBA number.")
+    if rgba < 0 or rgba > 0xFFFFFFFF:
+        raise ValueError(f"{rgba!r} is not an RGBA number.")
 
-    return (rgba >> 24, (rgba >> 16) % 256, (rgba >> 8) % 256, rgba % 256)
+    return (rgba >> 24, rgba >> 16 & 0xFF, rgba >> 8 & 0xFF, rgba & 0xFF)
 
 
 def rgb_to_hex(rgb):
     """Convert an RGB tuple into a 6-digit hexadecimal RGB number."""
-    if not all(isinstance(n, int) and 0 <= n < 256 for n in rgb) or len(rgb) != 3:
-        raise ValueError("{rgb!r} is not an RGB tuple.")
-    r, g, b = rgb
+    try:
+        r, g, b = rgb
+        # Any bit outside of the lowest 8 is set for negative or too large bands
+        invalid = (r | g | b) & ~0xFF
+    except (TypeError, ValueError):
+        invalid = True
+    if invalid:
+        raise ValueError(f"{rgb!r} is not an RGB tuple.")
     return r << 16 | g << 8 | b
 
 
 def rgba_to_hex(rgba):
     """Convert an RGBA tuple into an 8-digit hexadecimal RGBA number."""
-    if not all(isinstance(n, int) and 0 <= n < 256 for n in rgba) or len(rgba) != 4:
-        raise ValueError("{rgba!r} is not an RGBA tuple.")
-    r, g, b, a = rgba
+    try:
+        r, g, b, a = rgba
+        invalid = (r | g | b | a) & ~0xFF
+    except (TypeError, ValueError):
+        invalid = True
+    if invalid:
+        raise ValueError(f"{rgba!r} is not an RGBA tuple.")
     return r << 24 | g << 16 | b << 8 | a
 
 
@@ -88,9 +110,9 @@ def random_color(mode="RGB"):
     elif mode in ("L", "P"):
         return random.randint(0, 255)
     elif mode in ("RGB", "YCbCr", "LAB", "HSV"):
-        return tuple(random.randint(0, 255) for i in range(3))
+        return hex_to_rgb(random.getrandbits(24))
     elif mode in ("RGBA", "CMYK"):
-        return tuple(random.randint(0, 255) for i in range(4))
+        return hex_to_rgba(random.getrandbits(32))
     elif mode == "I":
         return random.randint(-(2 ** 31), 2 ** 31 - 1)
     else:
@@ -99,29 +121,58 @@ def random_color(mode="RGB"):
 
 def iter_pixels(img):
     """Returns a generator that iterates through every pixel of an image, yielding (x, y, color) tuples on every step."""
-    for y in range(img.height):
-        for x in range(img.width):
-            yield (x, y, img.getpixel((x, y)))
+    # getdata() reads the whole image in one go, which is far cheaper than a getpixel() call per pixel
+    coords = itertools.product(range(img.height), range(img.width))
+    for (y, x), col in zip(coords, img.getdata()):
+        yield (x, y, col)
 
 
 def color_distance(col1, col2):
     """Calculates the distance between two colors of equal modes."""
     if isinstance(col1, (int, float)):
         return float(abs(col1 - col2))
-    return sum((b1 - b2) ** 2 for b1, b2 in zip(col1, col2)) ** 0.5
+    n = len(col1)
+    if n == 3 and len(col2) == 3:
+        d1 = col1[0] - col2[0]
+        d2 = col1[1] - col2[1]
+        d3 = col1[2] - col2[2]
+        return math.sqrt(d1 * d1 + d2 * d2 + d3 * d3)
+    if n == 4 and len(col2) == 4:
+        d1 = col1[0] - col2[0]
+        d2 = col1[1] - col2[1]
+        d3 = col1[2] - col2[2]
+        d4 = col1[3] - col2[3]
+        return math.sqrt(d1 * d1 + d2 * d2 + d3 * d3 + d4 * d4)
+    return math.sqrt(sum((b1 - b2) ** 2 for b1, b2 in zip(col1, col2)))
 
 
 def eval_pixel(func, img):
     """Evaluate `func` at every pixel of `img` and return a new Image with those modified values. `func` should take 1 argument representing the original color in the mode of `img` and return a new color of the same mode. This is unlike PIL.Image.eval, which is evaluated on every subpixel on every band, not on every full pixel for multiband images."""
-    cache = {}
+    data = img.getdata()
+    # Only evaluate `func` once per distinct color, then map every pixel through the resulting lookup table
+    lut = {col: func(col) for col in set(data)}
     new = img.copy()
+    # putdata() only takes flat values, so convert the colors putpixel() would have accepted as well
+    single_band = len(img.getbands()) == 1
+    for col, newcol in lut.items():
+        if isinstance(newcol, tuple):
+            if img.mode == "P" and len(newcol) in (3, 4):
+                lut[col] = new.palette.getcolor(newcol)
+            elif single_band and len(newcol) == 1:
+                lut[col] = newcol[0]
+    # putdata() truncates floats and clamps out of range values for integer modes, where putpixel() raises or wraps around
+    bulk = True
+    if single_band and img.mode != "F":
+        lo, hi = _PUTDATA_RANGES.get(img.mode, (-math.inf, math.inf))
+        bulk = all(isinstance(v, int) and lo <= v <= hi for v in lut.values())
+    if bulk:
+        try:
+            new.putdata(list(map(lut.__getitem__, data)))
+            return new
+        except (TypeError, ValueError):
+            pass
     for x, y, col in iter_pixels(img):
-        if col in cache:
-            newcol = cache[col]
-        else:
-            newcol = func(col)
-            cache[col] = newcol
-        new.putpixel((x, y), newcol)
+        new.putpixel((x, y), lut[col])
     return new
 
 
@@ -148,12 +199,13 @@ def show_cli(img):
     nw = tw // 2
     nh = img.height * nw // img.width
     img = img.resize((nw, nh))
-    for y in range(img.height):
-        for x in range(img.width):
-            r, g, b = img.getpixel((x, y))
-            ansi = f"\33[48;2;{r};{g};{b}m  \33[49m"
-            print(ansi, end="")
-        print()
+    # Build the whole frame first and write it out at once instead of printing every pixel
+    parts = []
+    for x, y, (r, g, b) in iter_pixels(img):
+        parts.append(f"\33[48;2;{r};{g};{b}m  \33[49m")
+        if x == img.width - 1:
+            parts.append("\n")
+    sys.stdout.write("".join(parts))
 
 
 def rgb_to_hsv(rgb):
@@ -168,13 +220,9 @@ def rgb_to_hsv(rgb):
 def colorize(img, color):
     """Colorize an image with `color` (an RGB tuple). Always returns an RGB image."""
     h, _, _ = rgb_to_hsv(color)
-    img = img.convert("HSV")
-
-    def f(hsv):
-        _, s, v = hsv
-        return h, s, v
-
-    new = eval_pixel(f, img).convert("RGB")
+    _, s, v = img.convert("HSV").split()
+    hue = Image.new("L", img.size, h)
+    new = Image.merge("HSV", (hue, s, v)).convert("RGB")
     return new
 
 
@@ -1,6 +1,9 @@
 """Functions for parsing various strings to RGB tuples."""
+import functools
 import json
 import re
+import sys
+import types
 from pathlib import Path
 import importlib.resources as resources
 
@@ -20,101 +23,172 @@ __all__ = [
     "parse",
 ]
 
-_css_names = json.loads(resources.read_text("pilutils.colornames", "css.json"))
-_crayola_names = json.loads(resources.read_text("pilutils.colornames", "crayola.json"))
-_xkcd_names = json.loads(resources.read_text("pilutils.colornames", "xkcd.json"))
-_meodai_best_names = json.loads(
-    resources.read_text("pilutils.colornames", "meodai-best.json")
+
+# functools.cache is only available from 3.9 onwards
+@functools.lru_cache(maxsize=None)
+def _load_names(filename):
+    """Load a color name dataset on first use, decoding every hex string to an RGB tuple up front. The result is shared between all callers, so it is returned as a read-only mapping."""
+    names = json.loads(resources.read_text("pilutils.colornames", filename))
+    return types.MappingProxyType(
+        {
+            sys.intern(k.lower()): hex_to_rgb(int(v.lstrip("#"), 16))
+            for k, v in names.items()
+        }
+    )
+
+
+_name_datasets = (
+    "css.json",
+    "crayola.json",
+    "xkcd.json",
+    "meodai-best.json",
+    "meodai.json",
 )
-_meodai_names = json.loads(resources.read_text("pilutils.colornames", "meodai.json"))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_all_names():
+    """Merge all color name datasets into one mapping. Names that are in several datasets keep the value of the first one, in the same order `parse` tries them."""
+    names = {}
+    for filename in reversed(_name_datasets):
+        names.update(_load_names(filename))
+    return types.MappingProxyType(names)
+
+
+_hexdigits = frozenset("0123456789abcdefABCDEF")
+# All rgbfunc formats in one pattern, the alternatives can never overlap
+_match_rgbfunc = re.compile(
+    r"^rgb\(\s*(?:"
+    r"(?P<i1>\d{1,3})\s*,\s*(?P<i2>\d{1,3})\s*,\s*(?P<i3>\d{1,3})"
+    r"|(?P<f1>[01]\.\d+)\s*,\s*(?P<f2>[01]\.\d+)\s*,\s*(?P<f3>[01]\.\d+)"
+    r"|(?P<p1>\d{1,3}(?:\.\d+)?)%\s*,\s*(?P<p2>\d{1,3}(?:\.\d+)?)%\s*,\s*(?P<p3>\d{1,3}(?:\.\d+)?)%"
+    r")\s*\)$"
+).match
+
+
+def _strip_hex(s, length):
+    """Strip whitespace and an optional leading # from `s`, returning the bare hex digits or None if `s` is not `length` hex digits."""
+    s = s.strip()
+    if s.startswith("#"):
+        s = s[1:]
+    # int(s, 16) alone would also accept "0x", "_", signs and non-ASCII digits
+    if len(s) == length and _hexdigits.issuperset(s):
+        return s
+    return None
+
+
+def _parse_hex6(digits):
+    return hex_to_rgb(int(digits, 16))
+
+
+def _parse_hex3(digits):
+    h = int(digits, 16)
+    # n * 17 == 0xnn for a single nibble n
+    return ((h >> 8) * 17, (h >> 4 & 0xF) * 17, (h & 0xF) * 17)
 
 
 def parse_hex6(hex6):
     """Example: #ab34df"""
-    if m := re.match(r"^#?([0-9A-Fa-f]{6})$", hex6.strip()):
-        h = int(m.group(1), 16)
-        return hex_to_rgb(h)
+    if s := _strip_hex(hex6, 6):
+        return _parse_hex6(s)
     raise ValueError(f"String {hex6!r} does not match hex6 format.")
 
 
 def parse_hex3(hex3):
     """Example: #a3d"""
-    if m := re.match(r"^#?([0-9A-Fa-f]{3})$", hex3.strip()):
-        h3 = m.group(1)
-        return tuple(int(c * 2, 16) for c in h3)
+    if s := _strip_hex(hex3, 3):
+        return _parse_hex3(s)
     raise ValueError(f"String {hex3!r} does not match hex3 format.")
 
 
+def _parse_rgbfunc(rgbfunc, rgbfunc_int=True, rgbfunc_float=True, rgbfunc_percent=True):
+    """Match `rgbfunc` against all enabled rgbfunc formats in a single pass. Returns None if none of them match. `rgbfunc` must already be stripped."""
+    if m := _match_rgbfunc(rgbfunc):
+        i1, i2, i3, f1, f2, f3, p1, p2, p3 = m.groups()
+        if i1 is not None:
+            if rgbfunc_int:
+                t = (int(i1), int(i2), int(i3))
+                if not any(n > 255 for n in t):
+                    return t
+        elif f1 is not None:
+            if rgbfunc_float:
+                t = (float(f1), float(f2), float(f3))
+                if not any(n > 1 for n in t):
+                    return tuple(int(round(n * 255)) for n in t)
+        elif rgbfunc_percent:
+            t = (float(p1), float(p2), float(p3))
+            if not any(n > 100 for n in t):
+                return tuple(int(round(n * 255 / 100)) for n in t)
+    return None
+
+
 def parse_rgbfunc_int(rgbfunc):
     """Example: rgb(171, 52, 223)"""
-    if m := re.match(
-        r"^rgb\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*\)$", rgbfunc.strip()
-    ):
-        t = tuple(map(int, m.groups()))
-        if not any(n > 255 for n in t):
-            return t
+    if t := _parse_rgbfunc(rgbfunc.strip(), rgbfunc_float=False, rgbfunc_percent=False):
+        return t
     raise ValueError(f"String {rgbfunc!r} does not match rgbfunc_int format.")
 
 
 def parse_rgbfunc_float(rgbfunc):
     """Example: rgb(0.67, 0.2, 0.87)"""
-    if m := re.match(
-        r"^rgb\(\s*([01]\.\d+)\s*,\s*([01]\.\d+)\s*,\s*([01]\.\d+)\s*\)$",
-        rgbfunc.strip(),
-    ):
-        t = tuple(map(float, m.groups()))
-        if not any(n > 1 for n in t):
-            return tuple(int(round(n * 255)) for n in t)
+    if t := _parse_rgbfunc(rgbfunc.strip(), rgbfunc_int=False, rgbfunc_percent=False):
+        return t
     raise ValueError(f"String {rgbfunc!r} does not match rgbfunc_float format.")
 
 
 def parse_rgbfunc_percent(rgbfunc):
     """Example: rgb(67%, 20%, 87.5%)"""
-    if m := re.match(
-        r"^rgb\(\s*(\d{1,3}(?:\.\d+)?)%\s*,\s*(\d{1,3}(?:\.\d+)?)%\s*,\s*(\d{1,3}(?:\.\d+)?)%\s*\)$",
-        rgbfunc.strip(),
-    ):
-        t = tuple(map(float, m.groups()))
-        if not any(n > 100 for n in t):
-            return tuple(int(round(n * 255 / 100)) for n in t)
+    if t := _parse_rgbfunc(rgbfunc.strip(), rgbfunc_int=False, rgbfunc_float=False):
+        return t
     raise ValueError(f"String {rgbfunc!r} does not match rgbfunc_percent format.")
 
 
+def _lower(s):
+    """str.lower() always allocates a new string, so skip it for input that is already lowercase."""
+    return s if s.islower() else s.lower()
+
+
 def parse_name_css(name):
-    name = name.lower()
-    if name not in _css_names:
+    name = _lower(name)
+    try:
+        return _load_names("css.json")[name]
+    except KeyError:
         raise ValueError(f"Color {name!r} is not named in the CSS dataset.")
-    return parse_hex6(_css_names[name])
 
 
 def parse_name_crayola(name):
-    name = name.lower()
-    if name not in _crayola_names:
+    name = _lower(name)
+    try:
+        return _load_names("crayola.json")[name]
+    except KeyError:
         raise ValueError(f"Color {name!r} is not named in the crayola dataset.")
-    return parse_hex6(_crayola_names[name])
 
 
 def parse_name_xkcd(name):
-    name = name.lower()
-    if name not in _xkcd_names:
+    name = _lower(name)
+    try:
+        return _load_names("xkcd.json")[name]
+    except KeyError:
         raise ValueError(f"Color {name!r} is not named in the xkcd dataset.")
-    return parse_hex6(_xkcd_names[name])
 
 
 def parse_name_meodai_best(name):
-    name = name.lower()
-    if name not in _meodai_best_names:
+    name = _lower(name)
+    try:
+        return _load_names("meodai-best.json")[name]
+    except KeyError:
         raise ValueError(f"Color {name!r} is not named in the meodai-best dataset.")
-    return parse_hex6(_meodai_best_names[name])
 
 
 def parse_name_meodai(name):
-    name = name.lower()
-    if name not in _meodai_names:
+    name = _lower(name)
+    try:
+        return _load_names("meodai.json")[name]
+    except KeyError:
         raise ValueError(f"Color {name!r} is not named in the meodai dataset.")
-    return parse_hex6(_meodai_names[name])
 
 
+@functools.lru_cache(maxsize=1024)
 def parse(
     colstr,
     *,
@@ -129,35 +203,32 @@ def parse(
     name_meodai_best=True,
     name_meodai=True,
 ):
-    """Combine all other parse functions into one "universal" function. Use kwargs to disable certain parsers."""
-    funcs = []
-    if hex6:
-        funcs.append(parse_hex6)
-    if hex3:
-        funcs.append(parse_hex3)
-    if rgbfunc_int:
-        funcs.append(parse_rgbfunc_int)
-    if rgbfunc_float:
-        funcs.append(parse_rgbfunc_float)
-    if rgbfunc_percent:
-        funcs.append(parse_rgbfunc_percent)
-    if name_css:
-        funcs.append(parse_name_css)
-    if name_crayola:
-        funcs.append(parse_name_crayola)
-    if name_xkcd:
-        funcs.append(parse_name_xkcd)
-    if name_meodai_best:
-        funcs.append(parse_name_meodai_best)
-    if name_meodai:
-        funcs.append(parse_name_meodai)
-
-    res = None
-    for func in funcs:
-        try:
-            res = func(colstr)
-        except ValueError:
-            pass
-    if res is None:
-        raise ValueError(f"Could not find a working parser for {colstr!r}.")
-    return res
+    """Combine all other parse functions into one "universal" function. Use kwargs to disable certain parsers. The first parser that succeeds wins, in the order of the kwargs."""
+    # Classify and strip the input once so only parsers that can possibly match are tried
+    s = colstr.strip()
+    digits = s[1:] if s.startswith("#") else s
+    if len(digits) in (3, 6) and _hexdigits.issuperset(digits):
+        if hex6 and len(digits) == 6:
+            return _parse_hex6(digits)
+        if hex3 and len(digits) == 3:
+            return _parse_hex3(digits)
+    if s.startswith("rgb("):
+        if t := _parse_rgbfunc(s, rgbfunc_int, rgbfunc_float, rgbfunc_percent):
+            return t
+    elif not s.startswith("#"):
+        # Bare hex digits such as "facade" can be color names as well
+        # Names use the raw input, as the parse_name_* functions never stripped it either
+        name = _lower(colstr)
+        enabled = (name_css, name_crayola, name_xkcd, name_meodai_best, name_meodai)
+        if all(enabled):
+            datasets = (_load_all_names(),)
+        else:
+            datasets = (
+                _load_names(filename)
+                for filename, on in zip(_name_datasets, enabled)
+                if on
+            )
+        for names in datasets:
+            if (t := names.get(name)) is not None:
+                return t
+    raise ValueError(f"Could not find a working parser for {colstr!r}.")